@@ -71,6 +71,9 @@ class Parameters:
     prior: float
         Sum of the logarithm of the prior distribution, only for free parameters with a
         defined prior.
+    d_prior: List[float]
+        Partial derivative of the logarithm of the prior distribution, only for free
+        parameters (zero if no prior is defined).
     """
 
     def __init__(self, parameters: Union[List[str], List[dict]], name: str = ""):
@@ -251,6 +254,14 @@ class Parameters:
             ]
         )
 
+    @property
+    def d_prior(self) -> List:
+        """Partial derivative of the logarithm of the prior distribution"""
+        return [
+            p.prior.dlogpdf(p.value) if p.prior is not None else 0.0
+            for p in self.parameters_free
+        ]
+
     @property
     def free(self) -> List[bool]:
         return [p.free for p in self.parameters]
@@ -50,6 +50,15 @@ class BasePrior:
         """
         return self.scipy_dist.logpdf(x)
 
+    def dlogpdf(self, x: float) -> float:
+        """Evaluate the derivative of the logarithm of the probability density
+        function
+
+        Args:
+            x: Quantiles
+        """
+        raise NotImplementedError
+
     def random(self, n=1, hpd=None) -> np.ndarray:
         """Draw random samples from the prior distribution
 
@@ -140,6 +149,9 @@ class Normal(BasePrior, metaclass=PriorMeta):
     scipy_dist: stats.norm
     pymc_dist: pm.Normal
 
+    def dlogpdf(self, x: float) -> float:
+        return -(x - self.mu) / self.sigma**2
+
 
 class Gamma(BasePrior, metaclass=PriorMeta):
     """Gamma prior distribution
@@ -157,6 +169,9 @@ class Gamma(BasePrior, metaclass=PriorMeta):
     scipy_dist: lambda a, b: stats.gamma(a=a, scale=1.0 / b)
     pymc_dist: pm.Gamma
 
+    def dlogpdf(self, x: float) -> float:
+        return (self.alpha - 1.0) / x - self.beta
+
 
 class Beta(BasePrior, metaclass=PriorMeta):
     """Beta prior distribution
@@ -174,6 +189,9 @@ class Beta(BasePrior, metaclass=PriorMeta):
     scipy_dist: stats.beta
     pymc_dist: pm.Beta
 
+    def dlogpdf(self, x: float) -> float:
+        return (self.alpha - 1.0) / x - (self.beta - 1.0) / (1.0 - x)
+
 
 class InverseGamma(BasePrior, metaclass=PriorMeta):
     """Inverse Gamma prior distribution
@@ -191,6 +209,9 @@ class InverseGamma(BasePrior, metaclass=PriorMeta):
     scipy_dist: lambda a, b: stats.invgamma(a=a, scale=b)
     pymc_dist: pm.InverseGamma
 
+    def dlogpdf(self, x: float) -> float:
+        return (self.beta / x - self.alpha - 1.0) / x
+
 
 class LogNormal(BasePrior, metaclass=PriorMeta):
     """Log Normal prior distribution
@@ -208,6 +229,9 @@ class LogNormal(BasePrior, metaclass=PriorMeta):
     scipy_dist: lambda mu, sigma: stats.lognorm(scale=np.exp(mu), s=sigma)
     pymc_dist: pm.Lognormal
 
+    def dlogpdf(self, x: float) -> float:
+        return -(1.0 + (np.log(x) - self.mu) / self.sigma**2) / x
+
 
 class Uniform(BasePrior, metaclass=PriorMeta):
     """Uniform prior distribution
@@ -224,3 +248,6 @@ class Uniform(BasePrior, metaclass=PriorMeta):
     upper: float = 1.0
     scipy_dist: lambda lower, upper: stats.uniform(loc=lower, scale=upper - lower)
     pymc_dist: pm.Uniform
+
+    def dlogpdf(self, x: float) -> float:
+        return 0.0
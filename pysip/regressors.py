@@ -13,7 +13,6 @@ import pandas as pd
 import pymc as pm
 import pytensor.tensor as pt
 import xarray as xr
-from scipy.optimize import approx_fprime, minimize
 
 from .params.parameters import Parameters
 from .statespace.base import StateSpace
@@ -38,6 +37,8 @@ class _FdiffLoglikeGrad(pt.Op):
         self.eps = eps
 
     def perform(self, _, inputs, outputs):
+        from scipy.optimize import approx_fprime
+
         def _target(eta) -> float:
             estimator = deepcopy(self.estimator)
             estimator.ss.parameters.theta_free = eta
@@ -94,15 +95,24 @@ class Regressor:
         state-space model.
     time_scale : str
         Time series frequency, e.g. 's': seconds, 'D': days, etc.
+    dtype : type, optional
+        Floating point type used by the filters, by default np.float64. It applies to
+        `log_likelihood`, the state estimation and the objective of `fit` and
+        `fit_batch` when `jac` is not True. The gradient-based objective (`jac=True`,
+        the default) is always evaluated in np.float64. When a fit uses np.float32,
+        the log-likelihood is first checked against np.float64, falling back to
+        np.float64 if they differ. See `KalmanQR`.
     """
 
     ss: StateSpace
     inputs: Optional[Union[str, Sequence[str]]] = None
     outputs: Optional[Union[str, Sequence[str]]] = None
     time_scale: str = "s"
+    dtype: type = np.float64
 
     def __post_init__(self):
-        self.estimator = KalmanQR(self.ss)
+        self.estimator = KalmanQR(self.ss, dtype=self.dtype)
+        self._last_hess_inv = None
         if self.inputs is None:
             self.inputs = [node.name for node in self.ss.inputs]
         if self.outputs is None:
@@ -142,6 +152,41 @@ class Regressor:
             df, self.inputs, self.outputs if with_outputs else False, self.time_scale
         )
 
+    def prepare_data_batch(
+        self, dfs: Sequence[pd.DataFrame], with_outputs=True
+    ) -> Tuple[pd.Series, Tuple[pd.DataFrame, ...], ...]:
+        """Prepare a batch of series sharing the same time steps
+
+        Parameters
+        ----------
+        dfs : sequence of pd.DataFrame
+            Dataframes containing the data of each series
+        with_outputs : bool, optional
+            Whether to return the outputs, by default True
+
+        Returns
+        -------
+        Series:
+            time steps, common to all the series
+        tuple of DataFrame:
+            input data of each series
+        tuple of DataFrame:
+            derivative of input data of each series
+        tuple of DataFrame:
+            output data of each series (filled with NaNs if with_outputs=False)
+
+        Raises
+        ------
+        ValueError
+            If the series do not share the same time steps
+        """
+        dts, u, dtu, y = zip(*(self.prepare_data(df, with_outputs) for df in dfs))
+        dt = dts[0]
+        for other in dts[1:]:
+            if len(other) != len(dt) or not np.allclose(other, dt):
+                raise ValueError("All the series must share the same time steps")
+        return dt, u, dtu, y
+
     def simulate(self, df: pd.DataFrame) -> xr.Dataset:
         """Stochastic simulation of the state-space model
 
@@ -244,10 +289,10 @@ class Regressor:
     def _target(
         self,
         eta: np.ndarray,
-        dt: np.ndarray,
-        u: np.ndarray,
-        dtu: np.ndarray,
-        y: np.ndarray,
+        dt: pd.Series,
+        u: pd.DataFrame,
+        dtu: pd.DataFrame,
+        y: pd.DataFrame,
     ) -> float:
         """Evaluate the negative log-posterior
 
@@ -255,14 +300,14 @@ class Regressor:
         ----------
         eta : array_like, shape (n_eta, )
             Unconstrained parameters
-        dt : float
-            Sampling time
-        u : array_like, shape (n_u, n_steps)
-            Input data
-        dtu : array_like, shape (n_u, n_steps)
-            Forward finite difference of the input data
-        y : array_like, shape (n_y, n_steps)
-            Output data
+        dt : pd.Series
+            Time steps, see `prepare_data`
+        u : pd.DataFrame
+            Input data, of shape (n_steps, n_u)
+        dtu : pd.DataFrame
+            Forward finite difference of the input data, of shape (n_steps, n_u)
+        y : pd.DataFrame
+            Output data, of shape (n_steps, n_y)
 
         Returns
         -------
@@ -280,6 +325,95 @@ class Regressor:
 
         return log_posterior
 
+    def _target_and_grad(
+        self,
+        eta: np.ndarray,
+        dt: pd.Series,
+        u: pd.DataFrame,
+        dtu: pd.DataFrame,
+        y: pd.DataFrame,
+    ) -> Tuple[float, np.ndarray]:
+        """Evaluate the negative log-posterior and its gradient
+
+        Parameters
+        ----------
+        eta : array_like, shape (n_eta, )
+            Unconstrained parameters
+        dt : pd.Series
+            Time steps, see `prepare_data`
+        u : pd.DataFrame
+            Input data, of shape (n_steps, n_u)
+        dtu : pd.DataFrame
+            Forward finite difference of the input data, of shape (n_steps, n_u)
+        y : pd.DataFrame
+            Output data, of shape (n_steps, n_y)
+
+        Returns
+        -------
+        log_posterior : float
+            The negative log-posterior
+        d_log_posterior : array_like, shape (n_eta, )
+            Gradient of the negative log-posterior with respect to `eta`
+        """
+        estimator = deepcopy(self.estimator)
+        parameters = estimator.ss.parameters
+        parameters.eta_free = eta
+        log_likelihood, d_log_likelihood = estimator.log_likelihood_grad(
+            dt, u, dtu, y
+        )
+        log_posterior = log_likelihood - parameters.prior + parameters.penalty
+        d_log_posterior = d_log_likelihood + parameters.theta_jacobian * (
+            np.array(parameters.d_penalty) - np.array(parameters.d_prior)
+        )
+
+        return log_posterior, d_log_posterior
+
+    def _target_batch(
+        self,
+        eta: np.ndarray,
+        dt: pd.Series,
+        u: Sequence[pd.DataFrame],
+        dtu: Sequence[pd.DataFrame],
+        y: Sequence[pd.DataFrame],
+    ) -> float:
+        """Evaluate the negative log-posterior of parameters shared by a batch of
+        independent series, see `prepare_data_batch`."""
+        estimator = deepcopy(self.estimator)
+        parameters = estimator.ss.parameters
+        parameters.eta_free = eta
+        log_likelihood = estimator.log_likelihood_batch(dt, u, dtu, y).sum()
+        return log_likelihood - parameters.prior + parameters.penalty
+
+    def _target_batch_and_grad(
+        self,
+        eta: np.ndarray,
+        dt: pd.Series,
+        u: Sequence[pd.DataFrame],
+        dtu: Sequence[pd.DataFrame],
+        y: Sequence[pd.DataFrame],
+    ) -> Tuple[float, np.ndarray]:
+        """Evaluate the negative log-posterior of parameters shared by a batch of
+        independent series and its gradient, see `prepare_data_batch`."""
+        estimator = deepcopy(self.estimator)
+        parameters = estimator.ss.parameters
+        parameters.eta_free = eta
+        log_likelihood, d_log_likelihood = estimator.log_likelihood_grad_batch(
+            dt, u, dtu, y
+        )
+        log_posterior = log_likelihood.sum() - parameters.prior + parameters.penalty
+        d_log_posterior = d_log_likelihood.sum(axis=0) + parameters.theta_jacobian * (
+            np.array(parameters.d_penalty) - np.array(parameters.d_prior)
+        )
+
+        return log_posterior, d_log_posterior
+
+    def _check_dtype(self, *data, **kwargs) -> bool:
+        """Validate the estimator `dtype` on `data` (see `KalmanQR.check_dtype`) and
+        keep `dtype` in sync with the estimator if it falls back to np.float64"""
+        is_kept = self.estimator.check_dtype(*data, **kwargs)
+        self.dtype = self.estimator.dtype
+        return is_kept
+
     def fit(
         self,
         df: pd.DataFrame,
@@ -287,8 +421,10 @@ class Regressor:
         *,
         init: Literal["unconstrained", "prior", "zero", "fixed", "value"] = "fixed",
         hpd: float = 0.95,
-        jac="3-point",
-        method="BFGS",
+        jac=True,
+        method: Optional[str] = None,
+        compute_pvalues: bool = True,
+        warm_start: bool = False,
         **minimize_options,
     ) -> Union[pd.DataFrame, pd.DataFrame, dict]:
         """Estimate the parameters of the state-space model.
@@ -314,14 +450,35 @@ class Regressor:
             - 'value': initialize the parameters to the given values
         hpd : float, optional
             Highest posterior density interval. Used only when `init='prior'`.
+        jac : bool or str, optional
+            If True (default), the gradient of the negative log-posterior is computed
+            alongside its value with the sensitivity equations of the Kalman filter.
+            Otherwise, it is passed as is to `scipy.optimize.minimize` (e.g.
+            `'3-point'` for finite differences).
+        method : str, optional
+            Minimization method, see `scipy.optimize.minimize`. By default, `'BFGS'`
+            is used, or `'L-BFGS-B'` when there are more than 20 free parameters (the
+            dense inverse hessian approximation of BFGS becomes costly). When the
+            method does not provide a dense inverse hessian, it is computed at the
+            optimum by finite differences of the gradient (NaN, with a warning, if
+            the hessian is not positive definite).
+        compute_pvalues : bool, optional
+            If True (default), the p-values of the t-test of the estimated parameters
+            are computed. Otherwise, the `pvalue` column of the summary is left to NaN.
+        warm_start : bool, optional
+            If True, the minimization is preconditioned by the inverse hessian of the
+            previous fit (if any, with the same number of free parameters), instead
+            of starting from the identity. This reduces the number of iterations when
+            refitting on similar data, e.g. a sliding window or after a change of
+            hyperparameters. Default is False.
         minimize_options : dict, optional
             Options for the minimization method. See `scipy.optimize.minimize` for
             details. Compared to the original `scipy.optimize.minimize` function, the
             following options are set by default:
-            - `method='BFGS'`
-            - `jac='3-point'`
-            - `disp=True`
-            - `gtol=1e-4`
+            - `maxcor=10` (L-BFGS-B only)
+            - `gtol=1e-4` (BFGS and L-BFGS-B, only if `jac` is not True)
+            The minimization is silent, use `disp=True` to print the convergence
+            messages.
 
         Returns
         -------
@@ -341,44 +498,275 @@ class Regressor:
                 DeprecationWarning,
             )
             minimize_options.update(options)
-        minimize_options = {"disp": True, "gtol": 1e-4} | minimize_options
+        method, minimize_options = self._minimize_settings(
+            method, jac, minimize_options
+        )
 
         self.parameters.eta_free = self.parameters.init_parameters(1, init, hpd)
         data = self.prepare_data(df)
+        if jac is not True:
+            self._check_dtype(*data)
+
+        results = self._minimize(
+            self._target_and_grad if jac is True else self._target,
+            data,
+            method,
+            jac,
+            minimize_options,
+            warm_start,
+        )
+
+        return self._fit_summary(
+            results, len(data[0]), self._target_and_grad, data, compute_pvalues
+        )
+
+    def fit_batch(
+        self,
+        dfs: Sequence[pd.DataFrame],
+        *,
+        init: Literal["unconstrained", "prior", "zero", "fixed", "value"] = "fixed",
+        hpd: float = 0.95,
+        jac=True,
+        method: Optional[str] = None,
+        compute_pvalues: bool = True,
+        warm_start: bool = False,
+        **minimize_options,
+    ) -> Union[pd.DataFrame, pd.DataFrame, dict]:
+        """Estimate the parameters of the state-space model shared by several
+        independent series, e.g. the same model fitted on several zones monitored at
+        the same time steps.
+
+        The objective is the sum of the negative log-likelihood of each series, minus
+        the log-prior and plus the penalty (counted once).
+
+        Parameters
+        ----------
+        dfs : sequence of pandas.DataFrame
+            Training data of each series. They must share the same time index.
+        init : str, optional
+            Method to initialize the parameters, see `fit`.
+        hpd : float, optional
+            Highest posterior density interval. Used only when `init='prior'`.
+        jac : bool or str, optional
+            If True (default), the gradient is computed with the sensitivity
+            equations of the Kalman filter, series by series. Otherwise, it is passed
+            as is to `scipy.optimize.minimize` and the objective is evaluated by
+            filtering all the series at once, vectorized over the batch.
+        method : str, optional
+            Minimization method, see `fit`.
+        compute_pvalues : bool, optional
+            If True (default), the p-values of the t-test are computed, see `fit`.
+        warm_start : bool, optional
+            If True, the minimization is preconditioned by the inverse hessian of the
+            previous fit, see `fit`. Default is False.
+        minimize_options : dict, optional
+            Options for the minimization method, see `fit`.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Dataframe with the estimated parameters, their standard deviation, the
+            p-value of the t-test and penalty values.
+        pandas.DataFrame
+            Dataframe with the correlation matrix of the estimated parameters.
+        dict
+            Results object from the minimization method. See `scipy.optimize.minimize`
+            for details.
+        """
+        method, minimize_options = self._minimize_settings(
+            method, jac, minimize_options
+        )
+
+        self.parameters.eta_free = self.parameters.init_parameters(1, init, hpd)
+        data = self.prepare_data_batch(dfs)
+        if jac is not True:
+            self._check_dtype(data[0], *(var[0] for var in data[1:]))
+
+        results = self._minimize(
+            self._target_batch_and_grad if jac is True else self._target_batch,
+            data,
+            method,
+            jac,
+            minimize_options,
+            warm_start,
+        )
+
+        return self._fit_summary(
+            results,
+            len(dfs) * len(data[0]),
+            self._target_batch_and_grad,
+            data,
+            compute_pvalues,
+        )
+
+    def _minimize(
+        self,
+        fun,
+        data: tuple,
+        method: str,
+        jac,
+        minimize_options: dict,
+        warm_start: bool,
+    ):
+        """Minimize `fun` from the current parameters, preconditioned by the inverse
+        hessian of the previous fit if `warm_start` is True"""
+        from scipy.optimize import minimize
+
+        eta0 = np.asarray(self.parameters.eta_free, dtype=float)
+        L = None
+        hess_inv = self._last_hess_inv if warm_start else None
+        if hess_inv is not None and hess_inv.shape == (eta0.size, eta0.size):
+            try:
+                L = np.linalg.cholesky(hess_inv)
+            except np.linalg.LinAlgError:
+                warnings.warn("The previous inverse hessian is not positive definite")
+
+        if L is None:
+            return minimize(
+                fun=fun,
+                x0=eta0,
+                args=data,
+                method=method,
+                jac=jac,
+                options=minimize_options,
+            )
+
+        # BFGS started from the identity in z, with η = η0 + L z, is BFGS started
+        # from the inverse hessian L Lᵀ in η
+        def fun_z(z, *args):
+            if jac is True:
+                f, g = fun(eta0 + L @ z, *args)
+                return f, L.T @ g
+            return fun(eta0 + L @ z, *args)
+
+        jac_z = jac
+        if callable(jac):
+
+            def jac_z(z, *args):
+                return L.T @ jac(eta0 + L @ z, *args)
 
         results = minimize(
-            fun=self._target,
-            x0=self.parameters.eta_free,
+            fun=fun_z,
+            x0=np.zeros_like(eta0),
             args=data,
             method=method,
-            jac=jac,
+            jac=jac_z,
             options=minimize_options,
         )
+        results.x = eta0 + L @ results.x
+        if results.get("jac") is not None:
+            results.jac = np.linalg.solve(L.T, results.jac)
+        if isinstance(results.get("hess_inv"), np.ndarray):
+            results.hess_inv = L @ results.hess_inv @ L.T
+        else:
+            results.hess_inv = None
+        return results
+
+    def _minimize_settings(
+        self, method: Optional[str], jac, minimize_options: dict
+    ) -> Tuple[str, dict]:
+        """Default minimization method and options"""
+        if method is None:
+            method = "L-BFGS-B" if self.parameters.n_par_free > 20 else "BFGS"
+        if method == "L-BFGS-B":
+            minimize_options = {"maxcor": 10} | minimize_options
+        if jac is not True and method in ("BFGS", "L-BFGS-B"):
+            # finite difference gradients are too noisy for the default tolerance
+            minimize_options = {"gtol": 1e-4} | minimize_options
+        return method, minimize_options
+
+    @staticmethod
+    def _hessian(eta: np.ndarray, target_and_grad, data: tuple) -> np.ndarray:
+        """Hessian of the negative log-posterior, by central finite differences of
+        its gradient
+
+        Parameters
+        ----------
+        eta : array_like, shape (n_eta, )
+            Unconstrained parameters
+        target_and_grad : callable
+            Function returning the negative log-posterior and its gradient
+        data : tuple
+            Extra arguments of `target_and_grad`
+
+        Returns
+        -------
+        hessian : array_like, shape (n_eta, n_eta)
+            Hessian of the negative log-posterior with respect to `eta`
+        """
+        eta = np.asarray(eta, dtype=float)
+        h = np.finfo(float).eps ** (1.0 / 3.0) * np.maximum(1.0, np.abs(eta))
+        hessian = np.empty((eta.size, eta.size))
+        for j in range(eta.size):
+            step = np.zeros_like(eta)
+            step[j] = h[j]
+            _, grad_upper = target_and_grad(eta + step, *data)
+            _, grad_lower = target_and_grad(eta - step, *data)
+            hessian[:, j] = (grad_upper - grad_lower) / (2.0 * h[j])
+        return 0.5 * (hessian + hessian.T)
+
+    @staticmethod
+    def _inv_hessian(hessian: np.ndarray) -> np.ndarray:
+        """Inverse of the hessian of the negative log-posterior at the optimum, or NaN
+        (with a warning) if it is not positive definite"""
+        try:
+            np.linalg.cholesky(hessian)
+        except np.linalg.LinAlgError:
+            warnings.warn(
+                "The hessian is not positive definite at the optimum, the standard "
+                "deviations and correlations of the parameters are undefined."
+            )
+            return np.full_like(hessian, np.nan)
+        return np.linalg.inv(hessian)
 
+    def _fit_summary(
+        self,
+        results,
+        n_obs: int,
+        target_and_grad,
+        data: tuple,
+        compute_pvalues: bool = True,
+    ) -> Union[pd.DataFrame, pd.DataFrame, dict]:
+        """Set the optimal parameters and summarize the fit results"""
         self.parameters.eta_free = results.x
+        if results.get("jac") is None:
+            # e.g. gradient-free methods such as Nelder-Mead
+            _, results.jac = target_and_grad(results.x, *data)
+        if not isinstance(results.get("hess_inv"), np.ndarray):
+            # e.g. L-BFGS-B only provides a low-rank approximation as operator
+            results.hess_inv = self._inv_hessian(
+                self._hessian(results.x, target_and_grad, data)
+            )
+        self._last_hess_inv = (
+            results.hess_inv if np.isfinite(results.hess_inv).all() else None
+        )
         # inverse jacobian of the transform eta = f(theta)
-        inv_jac = np.diag(1.0 / np.array(self.parameters.eta_jacobian))
+        inv_jac = 1.0 / np.asarray(self.parameters.eta_jacobian, dtype=float)
 
-        # covariance matrix in the constrained space (e.g. theta)
-        cov_theta = inv_jac @ results.hess_inv @ inv_jac
+        # covariance matrix in the constrained space (e.g. theta), the jacobian is
+        # diagonal so the change of variables is an elementwise scaling
+        cov_theta = results.hess_inv * np.outer(inv_jac, inv_jac)
 
         # standard deviation of the constrained parameters
-        sig_theta = np.sqrt(np.diag(cov_theta)) * self.parameters.scale
-        inv_sig_theta = np.diag(1.0 / np.sqrt(np.diag(cov_theta)))
+        sig_theta_sd = np.sqrt(np.diag(cov_theta))
+        sig_theta = sig_theta_sd * self.parameters.scale
 
         # correlation matrix of the constrained parameters
-        corr_matrix = inv_sig_theta @ cov_theta @ inv_sig_theta
+        corr_matrix = cov_theta / np.outer(sig_theta_sd, sig_theta_sd)
+
+        theta_free = self.parameters.theta_free
         df = pd.DataFrame(
-            data=np.vstack(
-                [
-                    self.parameters.theta_free,
-                    sig_theta,
-                    ttest(self.parameters.theta_free, sig_theta, len(data[0])),
-                    np.abs(results.jac),
-                    np.abs(self.parameters.d_penalty),
-                ]
-            ).T,
-            columns=["θ", "σ(θ)", "pvalue", "|g(η)|", "|dpen(θ)|"],
+            {
+                "θ": theta_free,
+                "σ(θ)": sig_theta,
+                "pvalue": (
+                    ttest(theta_free, sig_theta, n_obs)
+                    if compute_pvalues
+                    else np.full(theta_free.size, np.nan)
+                ),
+                "|g(η)|": np.abs(results.jac),
+                "|dpen(θ)|": np.abs(self.parameters.d_penalty),
+            },
             index=self.parameters.names_free,
         )
         df_corr = pd.DataFrame(
@@ -489,6 +877,7 @@ class Regressor:
         P0: np.ndarray = None,
         smooth: bool = False,
         use_outputs: bool = True,
+        return_std: bool = True,
     ) -> xr.Dataset:
         """State-space model output prediction
 
@@ -508,6 +897,10 @@ class Regressor:
             If True, the Kalman smoother is used instead of the Kalman filter
         use_outputs : bool, optional
             If True, the outputs are used to do the estimation. Default is False.
+        return_std : bool, optional
+            If True (default), the standard deviation of the outputs is returned.
+            Otherwise, only their mean is computed: when the outputs are not used and
+            without smoothing, the covariance of the states is not propagated at all.
 
         Returns
         -------
@@ -525,29 +918,37 @@ class Regressor:
             itp_df[self.inputs] = itp_df[self.inputs].interpolate(method="linear")
         else:
             itp_df = df.copy()
-        ds = self.estimate_states(
-            itp_df, smooth=smooth, x0=x0, P0=P0, use_outputs=use_outputs
-        )
         idx_name = df.index.name or "time"
+        if not (return_std or use_outputs or smooth):
+            dt, u, dtu, _ = self.prepare_data(itp_df, with_outputs=False)
+            ds = xr.Dataset(
+                {
+                    "x": (
+                        (idx_name, "states"),
+                        self.estimator.filtering_mean(dt, u, dtu, x0)[..., 0],
+                    )
+                },
+                coords={
+                    idx_name: itp_df.index,
+                    "states": self.states,
+                    "outputs": self.outputs,
+                },
+            )
+        else:
+            ds = self.estimate_states(
+                itp_df, smooth=smooth, x0=x0, P0=P0, use_outputs=use_outputs
+            )
         if tnew is not None:
             ds = ds.sel(**{idx_name: tnew})
-        ds["y_mean"] = (
-            (idx_name, "outputs"),
-            (self.ss.C @ ds.x.values.reshape(-1, self.ss.nx, 1))[..., 0],
-        )
-
-        ds["y_std"] = (
-            (idx_name, "outputs"),
-            np.sqrt(
-                np.einsum(
-                    "...yx,...xx,...xy->...y",
-                    self.ss.C,
-                    ds.P.values,
-                    self.ss.C.T,
-                )
+        # Only the diagonal of C P Cᵀ is needed, so the (n_steps, ny, ny) output
+        # covariance is never materialized
+        C = self.ss.C
+        ds["y_mean"] = ((idx_name, "outputs"), np.einsum("yx,tx->ty", C, ds.x.values))
+        if return_std:
+            ds["y_std"] = (
+                (idx_name, "outputs"),
+                np.sqrt(np.einsum("yx,txz,yz->ty", C, ds.P.values, C)) + self.ss.R,
             )
-            + self.ss.R,
-        )
         return ds
 
     @property
@@ -475,6 +475,9 @@ class RCModel(StateSpace):
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
         """Discretization of RC model
 
+        Two-state models are discretized in closed form whatever `method` is, see
+        `discretization.state_input_2x2` and `discretization.diffusion_2x2`.
+
         Parameters
         ----------
         dt : float
@@ -490,7 +493,14 @@ class RCModel(StateSpace):
             - Q: Upper Cholesky factor of the process noise covariance matrix
         """
 
-        if self.method == "analytic":
+        if self.nx == 2:
+            Ad, B0d, B1d = discretization.state_input_2x2(
+                self.A, self.B, dt, self.hold_order
+            )
+            Qd = nearest_cholesky(
+                discretization.diffusion_2x2(self.A, self.Q.T @ self.Q, dt)
+            )
+        elif self.method == "analytic":
             Ad, B0d, B1d = discretization.state_input(
                 self.A, self.B, dt, self.hold_order, "analytic"
             )
@@ -209,9 +209,163 @@ def expm_2x2(X: np.ndarray) -> np.ndarray:
     -------
     array_like
         Matrix exponential of `X`
+
+    Notes
+    -----
+    Closed form in terms of the trace and the determinant of `X`: with s = tr(X) / 2
+    and q = s² - det(X), (X - s I)² = q I, hence
+
+    .. math::
+
+        e^X = e^s \\left(\\cosh(\\sqrt{q}) I + \\frac{\\sinh(\\sqrt{q})}{\\sqrt{q}}
+        (X - s I)\\right)
+
+    which becomes trigonometric for complex eigenvalues (q < 0). For distinct real
+    eigenvalues, e^{s ± √q} are evaluated directly to avoid overflowing for stiff
+    systems.
     """
-    w, v = eig_2x2(X)
-    return v @ np.diag(np.exp(w)) @ inv_2x2(v)
+    x00 = X[0, 0]
+    x01 = X[0, 1]
+    x10 = X[1, 0]
+    x11 = X[1, 1]
+    s = 0.5 * (x00 + x11)
+    q = 0.25 * (x00 - x11) ** 2 + x01 * x10
+    if q > 1.0:
+        r = np.sqrt(q)
+        e1 = np.exp(s + r)
+        e2 = np.exp(s - r)
+        c = 0.5 * (e1 + e2)
+        d = 0.5 * (e1 - e2) / r
+    elif q > 0.0:
+        r = np.sqrt(q)
+        es = np.exp(s)
+        c = es * np.cosh(r)
+        d = es * np.sinh(r) / r
+    elif q < 0.0:
+        r = np.sqrt(-q)
+        es = np.exp(s)
+        c = es * np.cos(r)
+        d = es * np.sin(r) / r
+    else:
+        c = d = np.exp(s)
+
+    return np.array(
+        [[c + d * (x00 - s), d * x01], [d * x10, c + d * (x11 - s)]], dtype=float
+    )
+
+
+def lyap_2x2(A: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    """Solution of the continuous Lyapunov equation A X + X Aᵀ = Q for 2-dimensional
+    square matrices
+
+    Parameters
+    ----------
+    A : array_like
+        2-dimensional square matrix
+    Q : array_like
+        2-dimensional symmetric matrix
+
+    Returns
+    -------
+    array_like
+        Symmetric solution `X`
+    """
+    a00 = A[0, 0]
+    a01 = A[0, 1]
+    a10 = A[1, 0]
+    a11 = A[1, 1]
+    # linear system on the upper triangular part of X
+    M = np.array(
+        [
+            [2.0 * a00, 2.0 * a01, 0.0],
+            [a10, a00 + a11, a01],
+            [0.0, 2.0 * a10, 2.0 * a11],
+        ]
+    )
+    # det(M) = 4 tr(A) det(A): the system is singular if an eigenvalue of A, or the
+    # sum of the two, is zero
+    det = 4.0 * (a00 + a11) * (a00 * a11 - a01 * a10)
+    scale = (abs(a00) + abs(a01) + abs(a10) + abs(a11)) ** 3
+    if not abs(det) > np.finfo(float).eps * scale:
+        return solve_continuous_lyapunov(A, Q)
+    x00, x01, x11 = inv_3x3(M) @ np.array([Q[0, 0], Q[0, 1], Q[1, 1]])
+    return np.array([[x00, x01], [x01, x11]])
+
+
+def phi_2x2(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Matrix exponential and the first two φ-functions of a 2-dimensional square
+    matrix
+
+    .. math::
+
+        \\varphi_1(X) = \\int_0^1 e^{X \\tau} d\\tau, \\quad
+        \\varphi_2(X) = \\int_0^1 e^{X \\tau} (1 - \\tau) d\\tau
+
+    Parameters
+    ----------
+    X : array_like
+        2-dimensional square matrix
+
+    Returns
+    -------
+    E : array_like
+        Matrix exponential of `X`
+    phi1 : array_like
+        First φ-function of `X`, X⁻¹ (e^X - I) if `X` is invertible
+    phi2 : array_like
+        Second φ-function of `X`, X⁻² (e^X - I - X) if `X` is invertible
+
+    Notes
+    -----
+    With s = tr(X) / 2 and Y = X - s I, Y² = q I where q = s² - det(X), so any
+    analytic function of `X` writes c I + d Y. The three functions are computed on
+    the pairs (c, d) by scaling and squaring: truncated Taylor series of X / 2^m
+    followed by m doublings e^{2Z} = (e^Z)², φ₁(2Z) = (e^Z + I) φ₁(Z) / 2 and
+    φ₂(2Z) = (φ₁(Z)² + 2 φ₂(Z)) / 4. Unlike X⁻¹ (e^X - I), this does not cancel
+    when an eigenvalue of `X` is small.
+    """
+    x00 = float(X[0, 0])
+    x01 = float(X[0, 1])
+    x10 = float(X[1, 0])
+    x11 = float(X[1, 1])
+    s = 0.5 * (x00 + x11)
+    q = 0.25 * (x00 - x11) ** 2 + x01 * x10
+
+    # scale the spectral radius of X below 1/2
+    rho = abs(s) + np.sqrt(abs(q))
+    m = int(np.ceil(np.log2(2.0 * rho))) if rho > 0.5 else 0
+    a = s * 2.0**-m
+    b = 2.0**-m
+
+    # Taylor series of the terms (X / 2^m)^j / j!
+    tc, td = 1.0, 0.0
+    ec, ed = 1.0, 0.0
+    p1c, p1d = 1.0, 0.0
+    p2c, p2d = 0.5, 0.0
+    for j in range(1, 15):
+        tc, td = (tc * a + td * b * q) / j, (tc * b + td * a) / j
+        ec += tc
+        ed += td
+        p1c += tc / (j + 1)
+        p1d += td / (j + 1)
+        p2c += tc / ((j + 1) * (j + 2))
+        p2d += td / ((j + 1) * (j + 2))
+
+    for _ in range(m):
+        p2c, p2d = (
+            0.25 * (p1c * p1c + p1d * p1d * q + 2.0 * p2c),
+            0.25 * (2.0 * p1c * p1d + 2.0 * p2d),
+        )
+        p1c, p1d = (
+            0.5 * ((ec + 1.0) * p1c + ed * p1d * q),
+            0.5 * ((ec + 1.0) * p1d + ed * p1c),
+        )
+        ec, ed = ec * ec + ed * ed * q, 2.0 * ec * ed
+
+    return tuple(
+        np.array([[c + d * (x00 - s), d * x01], [d * x10, c + d * (x11 - s)]])
+        for c, d in ((ec, ed), (p1c, p1d), (p2c, p2d))
+    )
 
 
 def state_input(
@@ -274,6 +428,8 @@ def state(A: np.ndarray, dt: float = 1.0) -> np.ndarray:
     Ad : array_like
         Discrete state matrix
     """
+    if A.shape == (2, 2):
+        return expm_2x2(A * dt)
     return expm(A * dt)
 
 
@@ -369,6 +525,41 @@ def state_input_expm(
     return Ad, B0d, B1d
 
 
+def state_input_2x2(
+    A: np.ndarray, B: np.ndarray, dt: float = 1.0, order_hold: int = 0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Discretize the state and input matrices of a 2-dimensional state-space model
+    in closed form, see `phi_2x2`
+
+    Parameters
+    ----------
+    A : numpy.array
+        2-dimensional state matrix
+    B : numpy.array
+        Input matrix
+    dt : float
+        Sampling time
+    order_hold : int
+        zero order hold = 0 or first order hold = 1
+
+    Returns
+    -------
+    Ad : numpy.array
+        Discrete state matrix
+    B0d : numpy.array
+        Discrete input matrix (zero order hold)
+    B1d : numpy.array
+        Discrete input matrix (first order hold)
+    """
+    Ad, phi1, phi2 = phi_2x2(A * dt)
+    B0d = dt * phi1 @ B
+    if order_hold == 0:
+        B1d = np.zeros_like(B0d)
+    else:
+        B1d = dt**2 * phi2 @ B
+    return Ad, B0d, B1d
+
+
 def expm_triu(
     a11: np.ndarray,
     a12: np.ndarray,
@@ -433,6 +624,80 @@ def diffusion_mfd(A: np.ndarray, Q: np.ndarray, dt: float = 1.0) -> np.ndarray:
     return Fd[:, nx:] @ Fd[:, :nx].T
 
 
+def diffusion_2x2(A: np.ndarray, Q: np.ndarray, dt: float = 1.0) -> np.ndarray:
+    """Discretize the diffusion matrix of a 2-dimensional state-space model in closed
+    form
+
+    Parameters
+    ----------
+    A : array_like
+        2-dimensional state matrix
+    Q : array_like
+        Diffusion matrix
+    dt : float
+        Sampling time
+
+    Returns
+    -------
+    array_like
+        Process noise covariance matrix
+
+    Notes
+    -----
+    The integral Qd(h) = ∫₀ʰ e^{Aτ} Q e^{Aᵀτ} dτ is computed by scaling and
+    squaring: truncated Taylor series of the Lyapunov operator L(P) = A P + P Aᵀ for
+    h = dt / 2^m, followed by m doublings Qd(2h) = Qd(h) + e^{Ah} Qd(h) e^{Aᵀh}.
+    Unlike `diffusion_lyap`, all the terms are added without cancellation.
+    """
+    if not Q.any():
+        return Q
+
+    a00 = float(A[0, 0])
+    a01 = float(A[0, 1])
+    a10 = float(A[1, 0])
+    a11 = float(A[1, 1])
+
+    # scale the norm of A h below 1/2, hence the one of L h below 1
+    rho = max(abs(a00) + abs(a01), abs(a10) + abs(a11)) * dt
+    m = int(np.ceil(np.log2(2.0 * rho))) if rho > 0.5 else 0
+    h = dt * 2.0**-m
+
+    # Taylor series Σ h^{j+1} / (j+1)! Lʲ(Q) on the upper triangular part
+    t00, t01, t11 = h * float(Q[0, 0]), h * float(Q[0, 1]), h * float(Q[1, 1])
+    p00, p01, p11 = t00, t01, t11
+    for j in range(1, 19):
+        t00, t01, t11 = (
+            h / (j + 1) * 2.0 * (a00 * t00 + a01 * t01),
+            h / (j + 1) * (a10 * t00 + (a00 + a11) * t01 + a01 * t11),
+            h / (j + 1) * 2.0 * (a10 * t01 + a11 * t11),
+        )
+        p00 += t00
+        p01 += t01
+        p11 += t11
+
+    E = expm_2x2(A * h)
+    e00, e01, e10, e11 = E[0, 0], E[0, 1], E[1, 0], E[1, 1]
+    for _ in range(m):
+        # P + E P Eᵀ
+        u00 = e00 * p00 + e01 * p01
+        u01 = e00 * p01 + e01 * p11
+        u10 = e10 * p00 + e11 * p01
+        u11 = e10 * p01 + e11 * p11
+        p00, p01, p11 = (
+            p00 + u00 * e00 + u01 * e01,
+            p01 + u00 * e10 + u01 * e11,
+            p11 + u10 * e10 + u11 * e11,
+        )
+        e00, e01, e10, e11 = (
+            e00 * e00 + e01 * e10,
+            e00 * e01 + e01 * e11,
+            e10 * e00 + e11 * e10,
+            e10 * e01 + e11 * e11,
+        )
+
+    return np.array([[p00, p01], [p01, p11]])
+
+
 def diffusion_lyap(A: np.ndarray, Q: np.ndarray, Ad: np.ndarray) -> np.ndarray:
     """Discretize the diffusion matrix by solving the Lyapunov equation
 
@@ -452,6 +717,8 @@ def diffusion_lyap(A: np.ndarray, Q: np.ndarray, Ad: np.ndarray) -> np.ndarray:
     """
     if not Q.any():
         return Q
+    if A.shape == (2, 2):
+        return lyap_2x2(A, -Q + Ad @ Q @ Ad.T)
     return solve_continuous_lyapunov(A, -Q + Ad @ Q @ Ad.T)
 
 
@@ -63,15 +63,28 @@ class TwTi_RoRiAwAicv(RCModel):
             *_,
         ) = self.parameters.theta
 
-        self.A[:] = [
-            [-(Ro + Ri) / (Cw * Ri * Ro), 1.0 / (Cw * Ri)],
-            [1.0 / (Ci * Ri), -1.0 / (Ci * Ri)],
-        ]
-        self.B[:] = [
-            [1.0 / (Cw * Ro), Aw / Cw, 0.0, 0.0],
-            [0.0, Ai / Ci, 1.0 / Ci, cv / Ci],
-        ]
-        self.Q[self._diag] = [sigw_w, sigw_i]
+        inv_CwRo = 1.0 / (Cw * Ro)
+        inv_CwRi = 1.0 / (Cw * Ri)
+        inv_CiRi = 1.0 / (Ci * Ri)
+        inv_Ci = 1.0 / Ci
+
+        A = self.A
+        A[0, 0] = -(inv_CwRo + inv_CwRi)
+        A[0, 1] = inv_CwRi
+        A[1, 0] = inv_CiRi
+        A[1, 1] = -inv_CiRi
+
+        B = self.B
+        B[0, 0] = inv_CwRo
+        B[0, 1] = Aw / Cw
+        B[1, 1] = Ai * inv_Ci
+        B[1, 2] = inv_Ci
+        B[1, 3] = cv * inv_Ci
+
+        self.Q[0, 0] = sigw_w
+        self.Q[1, 1] = sigw_i
         self.R[0, 0] = sigv
-        self.x0[:, 0] = [x0_w, x0_i]
-        self.P0[self._diag] = [sigx0_w, sigx0_i]
+        self.x0[0, 0] = x0_w
+        self.x0[1, 0] = x0_i
+        self.P0[0, 0] = sigx0_w
+        self.P0[1, 1] = sigx0_i
@@ -3,18 +3,27 @@ import math
 from typing import NamedTuple, Sequence
 import warnings
 from dataclasses import dataclass
+from functools import partial
 import numpy as np
 import pandas as pd
 from .statespace.base import StateSpace
 
-from numba.core.errors import NumbaPerformanceWarning
 import xarray as xr
 
+try:
+    from numba.core.errors import NumbaPerformanceWarning
+except ImportError:
+
+    class NumbaPerformanceWarning(Warning):
+        """Placeholder for the numba warning silenced around the jitted calls"""
+
 
 #### Models, compatible with the Numba implementation of the Kalman filter ####
 
 
 class States(NamedTuple):
+    # A, B0, B1 and Q are only stored for the unique time steps (last axis): `idx`
+    # gives, for each time step, the position of the matching discrete matrices.
     A: np.ndarray
     B0: np.ndarray
     B1: np.ndarray
@@ -22,6 +31,7 @@ class States(NamedTuple):
     D: np.ndarray
     Q: np.ndarray
     R: np.ndarray
+    idx: np.ndarray
 
 
 class KalmanResult(NamedTuple):
@@ -138,55 +148,90 @@ def _solve_triu_inplace(A, b):
     return b
 
 
+def _givens_triu_inplace(M):
+    # Triangularize M in place by Givens rotations, leaving the R factor of its QR
+    # decomposition in the upper part. For the small matrices of the filter, this is
+    # much cheaper than a call to LAPACK. The sign of the diagonal follows the LAPACK
+    # Householder convention (-sign of the diagonal element when the column is reduced)
+    # so the innovations keep the same sign as with `np.linalg.qr`.
+    m, n = M.shape
+    for j in range(min(m, n)):
+        alpha = M[j, j]
+        reduced = False
+        for i in range(j + 1, m):
+            b = M[i, j]
+            if b == 0.0:
+                continue
+            reduced = True
+            a = M[j, j]
+            r = math.hypot(a, b)
+            c = a / r
+            s = b / r
+            for k in range(j, n):
+                t = M[j, k]
+                M[j, k] = c * t + s * M[i, k]
+                M[i, k] = c * M[i, k] - s * t
+        if reduced and alpha >= 0.0:
+            for k in range(j, n):
+                M[j, k] = -M[j, k]
+    return M
+
+
 def _update(
     C, D, R, x, P, u, y, _Arru
 ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     ny, _ = C.shape
     _Arru[:ny, :ny] = R
+    _Arru[:ny, ny:] = 0.0
     _Arru[ny:, :ny] = P @ C.T
     _Arru[ny:, ny:] = P
-    _, r_fact = np.linalg.qr(_Arru)
-    S = r_fact[:ny, :ny]
+    r_fact = _givens_triu_inplace(_Arru)
+    S = r_fact[:ny, :ny].copy()
     if ny == 1:
         k = (y - C @ x - D @ u) / S[0, 0]
         x = x + r_fact[:1, 1:].T * k
     else:
         k = _solve_triu_inplace(S, y - C @ x - D @ u)
         x = x + r_fact[:ny, ny:].T @ k
-    P = r_fact[ny:, ny:]
+    P = r_fact[ny:, ny:].copy()
     return x, P, k, S
 
 
-def _predict(A, B0, B1, Q, x, P, u, dtu) -> tuple[np.ndarray, np.ndarray]:
-    _, r = np.linalg.qr(np.vstack((P @ A.T, Q)))
+def _predict(A, B0, B1, Q, x, P, u, dtu, _Arrp) -> tuple[np.ndarray, np.ndarray]:
+    nx = A.shape[0]
+    _Arrp[:nx] = P @ A.T
+    _Arrp[nx:] = Q
+    r = _givens_triu_inplace(_Arrp)[:nx].copy()
     x = A @ x + B0 @ u + B1 @ dtu
     return x, r
 
 
 def _kalman_step(
-    x, P, u, dtu, y, states, _Arru
+    x, P, u, dtu, y, states, _Arru, _Arrp
 ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     if ~np.isnan(y).any():
         x_up, P_up, k, S = _update(states.C, states.D, states.R, x, P, u, y, _Arru)
     else:
         x_up, P_up = x, P
-        k = np.full((states.C.shape[0], 1), np.nan)
-        S = np.full((states.C.shape[0], states.C.shape[0]), np.nan)
+        k = np.full((states.C.shape[0], 1), np.nan, dtype=x.dtype)
+        S = np.full((states.C.shape[0], states.C.shape[0]), np.nan, dtype=x.dtype)
     x_pred, P_pred = _predict(
-        states.A, states.B0, states.B1, states.Q, x_up, P_up, u, dtu
+        states.A, states.B0, states.B1, states.Q, x_up, P_up, u, dtu, _Arrp
     )
     return x_up, P_up, k, S, x_pred, P_pred
 
 
 def _unpack_states(states, i) -> States:
+    j = states.idx[i]
     return States(
-        states.A[:, :, i],
-        states.B0[:, :, i],
-        states.B1[:, :, i],
+        states.A[:, :, j],
+        states.B0[:, :, j],
+        states.B1[:, :, j],
         states.C,
         states.D,
-        states.Q[:, :, i],
+        states.Q[:, :, j],
         states.R,
+        states.idx,
     )
 
 
@@ -197,11 +242,15 @@ def _log_likelihood(x0, P0, u, dtu, y, states) -> float:
     ny, nx = states.C.shape
     dtype = states.A.dtype
     _Arru = np.zeros((nx + ny, nx + ny), dtype=dtype)
+    _Arrp = np.zeros((2 * nx, nx), dtype=dtype)
     log_likelihood = 0.5 * n_timesteps * math.log(2.0 * math.pi)
+    yc = np.ascontiguousarray(y)
+    uc = np.ascontiguousarray(u)
+    dtuc = np.ascontiguousarray(dtu)
     for i in range(n_timesteps):
-        y_i = np.ascontiguousarray(y)[i].reshape(-1, 1)
-        u_i = np.ascontiguousarray(u)[i].reshape(-1, 1)
-        dtu_i = np.ascontiguousarray(dtu)[i].reshape(-1, 1)
+        y_i = yc[i].reshape(-1, 1)
+        u_i = uc[i].reshape(-1, 1)
+        dtu_i = dtuc[i].reshape(-1, 1)
         states_i = _unpack_states(states, i)
         if ~np.isnan(y_i).any():
             x, P, k, S = _update(
@@ -215,11 +264,86 @@ def _log_likelihood(x0, P0, u, dtu, y, states) -> float:
             else:
                 log_likelihood += np.linalg.slogdet(S)[1] + 0.5 * (k.T @ k)[0, 0]
         x, P = _predict(
-            states_i.A, states_i.B0, states_i.B1, states_i.Q, x, P, u_i, dtu_i
+            states_i.A, states_i.B0, states_i.B1, states_i.Q, x, P, u_i, dtu_i, _Arrp
         )
     return log_likelihood
 
 
+def _log_likelihood_grad(
+    x0, P0, u, dtu, y, states, dstates, dx0, dP0
+) -> tuple[float, np.ndarray]:
+    # The square-root filter gives the values, the sensitivities are propagated on the
+    # covariance form: dP, dQ, dR and dP0 are derivatives of the covariance matrices.
+    x = x0
+    P = P0
+    n_timesteps = y.shape[0]
+    ny, nx = states.C.shape
+    n_par = dx0.shape[0]
+    dtype = states.A.dtype
+    _Arru = np.zeros((nx + ny, nx + ny), dtype=dtype)
+    _Arrp = np.zeros((2 * nx, nx), dtype=dtype)
+    dx = dx0.copy()
+    dP = dP0.copy()
+    grad = np.zeros(n_par, dtype=dtype)
+    log_likelihood = 0.5 * n_timesteps * math.log(2.0 * math.pi)
+    yc = np.ascontiguousarray(y)
+    uc = np.ascontiguousarray(u)
+    dtuc = np.ascontiguousarray(dtu)
+    for i in range(n_timesteps):
+        y_i = yc[i].reshape(-1, 1)
+        u_i = uc[i].reshape(-1, 1)
+        dtu_i = dtuc[i].reshape(-1, 1)
+        states_i = _unpack_states(states, i)
+        C = states_i.C
+        if ~np.isnan(y_i).any():
+            Pc = P.T @ P
+            e = y_i - C @ x - states_i.D @ u_i
+            x_prev = x
+            x, P, k, S = _update(C, states_i.D, states_i.R, x, P, u_i, y_i, _Arru)
+            if ny == 1:
+                Si = S[0, 0]
+                log_likelihood += (
+                    math.log(abs(Si.real) + abs(Si.imag)) + 0.5 * k[0, 0] ** 2
+                )
+            else:
+                log_likelihood += np.linalg.slogdet(S)[1] + 0.5 * (k.T @ k)[0, 0]
+            Sc = S.T @ S
+            Sc_inv = np.linalg.inv(Sc)
+            K = Pc @ C.T @ Sc_inv
+            Sc_inv_e = Sc_inv @ e
+            for j in range(n_par):
+                dC = dstates.C[j]
+                dPj = dP[j]
+                dCPCt = dC @ Pc @ C.T
+                dS = dCPCt + C @ dPj @ C.T + dCPCt.T + dstates.R[j]
+                de = -dC @ x_prev - C @ dx[j] - dstates.D[j] @ u_i
+                grad[j] += (
+                    0.5 * np.trace(Sc_inv @ dS)
+                    + (Sc_inv_e.T @ de)[0, 0]
+                    - 0.5 * (Sc_inv_e.T @ dS @ Sc_inv_e)[0, 0]
+                )
+                dK = (dPj @ C.T + Pc @ dC.T - K @ dS) @ Sc_inv
+                dKSKt = dK @ Sc @ K.T
+                dx[j] = dx[j] + dK @ e + K @ de
+                dP[j] = dPj - dKSKt - K @ dS @ K.T - dKSKt.T
+        A = states_i.A
+        Pc = P.T @ P
+        i_dt = states.idx[i]
+        dA_i = dstates.A[i_dt]
+        dB0_i = dstates.B0[i_dt]
+        dB1_i = dstates.B1[i_dt]
+        dQ_i = dstates.Q[i_dt]
+        for j in range(n_par):
+            dA = dA_i[j]
+            dAPAt = dA @ Pc @ A.T
+            dx[j] = dA @ x + A @ dx[j] + dB0_i[j] @ u_i + dB1_i[j] @ dtu_i
+            dP[j] = dAPAt + A @ dP[j] @ A.T + dAPAt.T + dQ_i[j]
+        x, P = _predict(
+            A, states_i.B0, states_i.B1, states_i.Q, x, P, u_i, dtu_i, _Arrp
+        )
+    return log_likelihood, grad
+
+
 def _filtering(x0, P0, u, dtu, y, states) -> KalmanResult:
     x = x0
     P = P0
@@ -227,13 +351,19 @@ def _filtering(x0, P0, u, dtu, y, states) -> KalmanResult:
     ny, nx = states.C.shape
     dtype = states.A.dtype
     _Arru = np.zeros((nx + ny, nx + ny), dtype=dtype)
+    _Arrp = np.zeros((2 * nx, nx), dtype=dtype)
     res = _allocate_kalman_res(n_timesteps, nx, ny)
+    yc = np.ascontiguousarray(y)
+    uc = np.ascontiguousarray(u)
+    dtuc = np.ascontiguousarray(dtu)
     for i in range(n_timesteps):
-        y_i = np.ascontiguousarray(y)[i].reshape(-1, 1)
-        u_i = np.ascontiguousarray(u)[i].reshape(-1, 1)
-        dtu_i = np.ascontiguousarray(dtu)[i].reshape(-1, 1)
+        y_i = yc[i].reshape(-1, 1)
+        u_i = uc[i].reshape(-1, 1)
+        dtu_i = dtuc[i].reshape(-1, 1)
         states_i = _unpack_states(states, i)
-        x_up, P_up, k, S, x, P = _kalman_step(x, P, u_i, dtu_i, y_i, states_i, _Arru)
+        x_up, P_up, k, S, x, P = _kalman_step(
+            x, P, u_i, dtu_i, y_i, states_i, _Arru, _Arrp
+        )
         _pack_kalman_res(res, i, (x_up, P_up.T @ P_up, k, S))
     return res
 
@@ -245,21 +375,27 @@ def _smoothing(x0, P0, u, dtu, y, states) -> tuple[np.ndarray, np.ndarray]:
     ny, nx = states.C.shape
     dtype = states.A.dtype
     _Arru = np.zeros((nx + ny, nx + ny), dtype=dtype)
+    _Arrp = np.zeros((2 * nx, nx), dtype=dtype)
     xp = np.empty((n_timesteps, nx, 1), dtype=dtype)
     Pp = np.empty((n_timesteps, nx, nx), dtype=dtype)
     res = _allocate_kalman_res(n_timesteps, nx, ny)
+    yc = np.ascontiguousarray(y)
+    uc = np.ascontiguousarray(u)
+    dtuc = np.ascontiguousarray(dtu)
     for i in range(n_timesteps):
-        y_i = np.ascontiguousarray(y)[i].reshape(-1, 1)
-        u_i = np.ascontiguousarray(u)[i].reshape(-1, 1)
-        dtu_i = np.ascontiguousarray(dtu)[i].reshape(-1, 1)
+        y_i = yc[i].reshape(-1, 1)
+        u_i = uc[i].reshape(-1, 1)
+        dtu_i = dtuc[i].reshape(-1, 1)
         states_i = _unpack_states(states, i)
         xp[i] = x
         Pp[i] = P.T @ P
-        x_up, P_up, k, S, x, P = _kalman_step(x, P, u_i, dtu_i, y_i, states_i, _Arru)
+        x_up, P_up, k, S, x, P = _kalman_step(
+            x, P, u_i, dtu_i, y_i, states_i, _Arru, _Arrp
+        )
         _pack_kalman_res(res, i, (x_up, P_up.T @ P_up, k, S))
 
     for i in range(n_timesteps - 2, -1, -1):
-        G = np.linalg.solve(Pp[i + 1], states.A[:, :, i] @ res.P[i]).T
+        G = np.linalg.solve(Pp[i + 1], states.A[:, :, states.idx[i]] @ res.P[i]).T
         res.x[i, :, :] += G @ (res.x[i + 1, :, :] - xp[i + 1, :, :])
         res.P[i, :, :] += G @ (res.P[i + 1, :, :] - Pp[i + 1, :, :]) @ G.T
     return res
@@ -270,9 +406,11 @@ def _simulate(x0, u, dtu, states) -> SimulationResults:
     n_timesteps = u.shape[0]
     ny, nx = states.C.shape
     res = _allocate_simulation_res(n_timesteps, nx, ny)
+    uc = np.ascontiguousarray(u)
+    dtuc = np.ascontiguousarray(dtu)
     for i in range(n_timesteps):
-        u_i = np.ascontiguousarray(u)[i].reshape(-1, 1)
-        dtu_i = np.ascontiguousarray(dtu)[i].reshape(-1, 1)
+        u_i = uc[i].reshape(-1, 1)
+        dtu_i = dtuc[i].reshape(-1, 1)
         states_i = _unpack_states(states, i)
         y = states_i.C @ x - states_i.D @ u_i
         x = (
@@ -287,6 +425,24 @@ def _simulate(x0, u, dtu, states) -> SimulationResults:
     return res
 
 
+def _filtering_mean(x0, u, dtu, states) -> np.ndarray:
+    # Without outputs to assimilate, the filtered mean is the propagated mean: the
+    # covariance (and its QR updates) is not needed.
+    x = x0
+    n_timesteps = u.shape[0]
+    nx = x0.shape[0]
+    xs = np.empty((n_timesteps, nx, 1), dtype=x0.dtype)
+    uc = np.ascontiguousarray(u)
+    dtuc = np.ascontiguousarray(dtu)
+    for i in range(n_timesteps):
+        u_i = uc[i].reshape(-1, 1)
+        dtu_i = dtuc[i].reshape(-1, 1)
+        states_i = _unpack_states(states, i)
+        xs[i] = x
+        x = states_i.A @ x + states_i.B0 @ u_i + states_i.B1 @ dtu_i
+    return xs
+
+
 def _estimate_output(x0, P0, u, dtu, y, states) -> OutputEstimateResult:
     n_timesteps = y.shape[0]
     ny = states.C.shape[0]
@@ -313,6 +469,156 @@ except ImportError:
     warnings.warn("Numba not installed, using pure python implementation")
 
 
+#### Batched numpy implementation of the Kalman filter ####
+# Independent series sharing the same model and time steps are filtered together:
+# the time recursion stays sequential but each step is vectorized over the batch axis
+# (numpy broadcasts matmul and QR over the leading dimension). Not jitted, numba does
+# not support stacked QR.
+
+
+def _log_likelihood_batch(x0, P0, u, dtu, y, states) -> np.ndarray:
+    n_batch, n_timesteps, _ = y.shape
+    ny, nx = states.C.shape
+    C, D, R = states.C, states.D, states.R
+    x = np.repeat(x0[None], n_batch, axis=0)
+    P = np.repeat(P0[None], n_batch, axis=0)
+    _Arru = np.zeros((n_batch, nx + ny, nx + ny), dtype=states.A.dtype)
+    _Arru[:, :ny, :ny] = R
+    _Arrp = np.zeros((n_batch, 2 * nx, nx), dtype=states.A.dtype)
+    log_likelihood = np.full(n_batch, 0.5 * n_timesteps * math.log(2.0 * math.pi))
+    for i in range(n_timesteps):
+        j = states.idx[i]
+        y_i = y[:, i, :, None]
+        u_i = u[:, i, :, None]
+        dtu_i = dtu[:, i, :, None]
+        observed = ~np.isnan(y_i).any(axis=(1, 2))
+        if observed.any():
+            _Arru[:, ny:, :ny] = P @ C.T
+            _Arru[:, ny:, ny:] = P
+            r_fact = np.linalg.qr(_Arru, mode="r")
+            S = r_fact[:, :ny, :ny]
+            with np.errstate(invalid="ignore"):
+                k = np.linalg.solve(S, y_i - C @ x - D @ u_i)
+                x_up = x + r_fact[:, :ny, ny:].transpose(0, 2, 1) @ k
+                ll = np.linalg.slogdet(S)[1] + 0.5 * np.sum(k**2, axis=(1, 2))
+            x = np.where(observed[:, None, None], x_up, x)
+            P = np.where(observed[:, None, None], r_fact[:, ny:, ny:], P)
+            log_likelihood += np.where(observed, ll, 0.0)
+        A = states.A[:, :, j]
+        _Arrp[:, :nx] = P @ A.T
+        _Arrp[:, nx:] = states.Q[:, :, j]
+        P = np.linalg.qr(_Arrp, mode="r")
+        x = A @ x + states.B0[:, :, j] @ u_i + states.B1[:, :, j] @ dtu_i
+    return log_likelihood
+
+
+#### Parallel (associative scan) implementation of the Kalman filter ####
+# Särkkä & García-Fernández, "Temporal parallelization of Bayesian smoothers" (2021).
+# Each time step is turned into an element (A, b, C, η, J) of an associative operator,
+# so the filtered moments are the prefix "sums" of the elements. They are computed by
+# a tree reduction of depth O(log n_timesteps), each level being vectorized over the
+# time steps. The elements are in covariance form, the sqrt factor of the innovation
+# covariance being recovered by QR at the end to match the sequential filter output.
+
+
+def _scan_combine(ei, ej) -> tuple[np.ndarray, ...]:
+    Ai, bi, Ci, etai, Ji = ei
+    Aj, bj, Cj, etaj, Jj = ej
+    G = np.eye(Ai.shape[-1]) + Ci @ Jj
+    # M = Aj (I + Ci Jj)⁻¹ and N = Aiᵀ (I + Jj Ci)⁻¹
+    M = np.linalg.solve(G.swapaxes(-1, -2), Aj.swapaxes(-1, -2)).swapaxes(-1, -2)
+    N = np.linalg.solve(G, Ai).swapaxes(-1, -2)
+    C = M @ Ci @ Aj.swapaxes(-1, -2) + Cj
+    J = N @ Jj @ Ai + Ji
+    return (
+        M @ Ai,
+        M @ (bi + Ci @ etaj) + bj,
+        0.5 * (C + C.swapaxes(-1, -2)),
+        N @ (etaj - Jj @ bi) + etai,
+        0.5 * (J + J.swapaxes(-1, -2)),
+    )
+
+
+def _associative_scan(fn, elems) -> list[np.ndarray]:
+    n = elems[0].shape[0]
+    if n < 2:
+        return elems
+    reduced = fn([e[0:-1:2] for e in elems], [e[1::2] for e in elems])
+    odd = _associative_scan(fn, reduced)
+    if n % 2 == 0:
+        even = fn([e[:-1] for e in odd], [e[2::2] for e in elems])
+    else:
+        even = fn(odd, [e[2::2] for e in elems])
+    scanned = []
+    for e, e_even, e_odd in zip(elems, even, odd):
+        res = np.empty_like(e)
+        res[0] = e[0]
+        res[2::2] = e_even
+        res[1::2] = e_odd
+        scanned.append(res)
+    return scanned
+
+
+def _filtering_scan(x0, P0, u, dtu, y, states) -> KalmanResult:
+    n_timesteps = y.shape[0]
+    ny, nx = states.C.shape
+    C, D, R = states.C, states.D, states.R
+    Rc = R.T @ R
+    y = y[:, :, None]
+    u = u[:, :, None]
+    dtu = dtu[:, :, None]
+    observed = ~np.isnan(y).any(axis=(1, 2))
+
+    # Transition into each time step, the first one being the prior (x0, P0)
+    j = states.idx[:-1]
+    F = np.zeros((n_timesteps, nx, nx))
+    F[1:] = states.A[:, :, j].transpose(2, 0, 1)
+    c = np.empty((n_timesteps, nx, 1))
+    c[0] = x0
+    c[1:] = (
+        states.B0[:, :, j].transpose(2, 0, 1) @ u[:-1]
+        + states.B1[:, :, j].transpose(2, 0, 1) @ dtu[:-1]
+    )
+    Q = np.empty((n_timesteps, nx, nx))
+    Q[0] = P0.T @ P0
+    Qj = states.Q[:, :, j].transpose(2, 0, 1)
+    Q[1:] = Qj.swapaxes(-1, -2) @ Qj
+
+    # Missing outputs are handled with a null observation matrix
+    Cm = np.where(observed[:, None, None], C, 0.0)
+    S = Cm @ Q @ Cm.swapaxes(-1, -2) + np.where(observed[:, None, None], Rc, np.eye(ny))
+    v = np.where(observed[:, None, None], np.nan_to_num(y) - C @ c - D @ u, 0.0)
+    CtSinv = np.linalg.solve(S, Cm).swapaxes(-1, -2)
+    K = Q @ CtSinv
+    IKC = np.eye(nx) - K @ Cm
+    FtCtSinv = F.swapaxes(-1, -2) @ CtSinv
+    elems = [
+        IKC @ F,
+        c + K @ v,
+        IKC @ Q,
+        FtCtSinv @ v,
+        FtCtSinv @ Cm @ F,
+    ]
+    _, x_up, P_up, _, _ = _associative_scan(_scan_combine, elems)
+
+    # Predicted moments, used to recover the innovations from the filtered ones
+    x_pred = c.copy()
+    x_pred[1:] += F[1:] @ x_up[:-1]
+    P_pred = Q.copy()
+    P_pred[1:] += F[1:] @ P_up[:-1] @ F[1:].swapaxes(-1, -2)
+    w, V = np.linalg.eigh(P_pred)
+    P_sqrt = np.sqrt(np.maximum(w, 0.0))[:, :, None] * V.swapaxes(-1, -2)
+    _Arru = np.empty((n_timesteps, ny + nx, ny))
+    _Arru[:, :ny] = R
+    _Arru[:, ny:] = P_sqrt @ C.T
+    S = np.linalg.qr(_Arru, mode="r")[:, :ny, :ny]
+    with np.errstate(invalid="ignore"):
+        k = np.linalg.solve(S, y - C @ x_pred - D @ u)
+    k[~observed] = np.nan
+    S[~observed] = np.nan
+    return KalmanResult(x_up, P_up, k, S)
+
+
 @dataclass
 class KalmanQR:
     """Bayesian Filter (Kalman Square Root filter)
@@ -321,6 +627,17 @@ class KalmanQR:
     ----------
     ss : StateSpace
         State space model.
+    scan_threshold : int, optional
+        Number of time steps above which `filtering` uses the parallel (associative
+        scan) filter instead of the sequential one, by default None (always use the
+        sequential filter). The parallel filter is not faster than the sequential
+        square-root filter for small state dimensions, and it always runs in
+        np.float64, see `filtering_scan`.
+    dtype : type, optional
+        Floating point type used by `log_likelihood`, `log_likelihood_batch` and the
+        sequential `filtering`, by default np.float64. The square-root filter keeps a
+        good accuracy in np.float32, see `check_dtype` to validate it on a dataset.
+        The gradient is always computed in np.float64.
 
     Notes
     -----
@@ -330,6 +647,30 @@ class KalmanQR:
     """
 
     ss: StateSpace
+    scan_threshold: int | None = None
+    dtype: type = np.float64
+
+    @staticmethod
+    def _unique_dt(dt: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+        """Unique time steps and, for each time step, the position of its value in the
+        unique time steps.
+
+        Time steps equal up to a relative tolerance are grouped together to absorb
+        floating point noise, and each group is represented by the exact value of its
+        first occurrence (the values are not rounded)."""
+        dt = np.asarray(dt, dtype=float)
+        if not dt.size:
+            return dt, np.zeros(0, dtype=np.intp)
+        order = np.argsort(dt, kind="stable")
+        dt_sorted = dt[order]
+        new_group = np.empty(dt.size, dtype=bool)
+        new_group[0] = True
+        new_group[1:] = np.diff(dt_sorted) > 1e-9 * np.abs(dt_sorted[1:])
+        idx = np.empty(dt.size, dtype=np.intp)
+        idx[order] = np.cumsum(new_group) - 1
+        first = np.full(idx[order[-1]] + 1, dt.size, dtype=np.intp)
+        np.minimum.at(first, idx, np.arange(dt.size))
+        return dt[first], idx
 
     def _proxy_params(
         self,
@@ -340,23 +681,139 @@ class KalmanQR:
     ):
         ss = self.ss
         ss.update()
-        dts, idx = np.unique(dt, return_inverse=True)
-        A = np.zeros((ss.nx, ss.nx, dt.size))
-        B0 = np.zeros((ss.nx, ss.nu, dt.size))
-        B1 = np.zeros((ss.nx, ss.nu, dt.size))
-        Q = np.zeros((ss.nx, ss.nx, dt.size))
-        Ai, B0i, B1i, Qi = map(np.dstack, zip(*map(ss.discretization, dts)))
-        A[:] = Ai[:, :, idx]
-        B0[:] = B0i[:, :, idx]
-        B1[:] = B1i[:, :, idx]
-        Q[:] = Qi[:, :, idx]
+        dts, idx = self._unique_dt(dt)
+        A, B0, B1, Q = map(np.dstack, zip(*map(ss.discretization, dts)))
 
         vars = [var.to_numpy() for var in vars]
-        states = States(A, B0, B1, ss.C, ss.D, Q, ss.R)
+        states = States(A, B0, B1, ss.C, ss.D, Q, ss.R, idx)
         x0 = x0 if x0 is not None else ss.x0
         P0 = P0 if P0 is not None else ss.P0
         return tuple([x0, P0, *vars, states])
 
+    def _to_dtype(self, params: tuple) -> tuple:
+        """Cast the arrays given to the filters (as returned by `_proxy_params`) to
+        `dtype`"""
+        *arrays, states = params
+        cast = partial(np.ascontiguousarray, dtype=self.dtype)
+        return (*map(cast, arrays), States(*map(cast, states[:-1]), states.idx))
+
+    def check_dtype(
+        self,
+        dt: pd.Series,
+        u: pd.DataFrame,
+        dtu: pd.DataFrame,
+        y: pd.DataFrame,
+        rtol: float = 1e-5,
+    ) -> bool:
+        """Check that the log-likelihood computed with `dtype` matches the one
+        computed in np.float64. If not, a warning is raised and `dtype` falls back to
+        np.float64.
+
+        Parameters
+        ----------
+        dt : pd.Series
+            Time steps.
+        u : pd.DataFrame
+            Output (or exogeneous) vector.
+        dtu : pd.DataFrame
+            Time derivative of the output vector.
+        y : pd.DataFrame
+            Measurement (or observation) vector.
+        rtol : float, optional
+            Relative tolerance on the log-likelihood, by default 1e-5.
+
+        Returns
+        -------
+        bool
+            True if `dtype` is kept.
+        """
+        if np.dtype(self.dtype) == np.float64:
+            return True
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=NumbaPerformanceWarning)
+            params = self._proxy_params(dt, (u, dtu, y))
+            log_likelihood = _log_likelihood(*params)
+            log_likelihood_dtype = _log_likelihood(*self._to_dtype(params))
+        if abs(log_likelihood_dtype - log_likelihood) <= rtol * abs(log_likelihood):
+            return True
+        warnings.warn(
+            f"The log-likelihood computed in {np.dtype(self.dtype)} differs from the "
+            f"one computed in float64 ({log_likelihood_dtype} != {log_likelihood}), "
+            "falling back to float64."
+        )
+        self.dtype = np.float64
+        return False
+
+    def _proxy_params_grad(
+        self, dt: pd.Series
+    ) -> tuple[States, np.ndarray, np.ndarray]:
+        """Derivatives of the discrete state-space matrices with respect to the free
+        unconstrained parameters η.
+
+        The matrices are only evaluated for the unique time steps, by central finite
+        differences: this is cheap compared to a filter pass, and avoid the need of an
+        analytic jacobian for each model. The noise matrices (Q, R, P0) are
+        differentiated in their covariance form.
+
+        The time step dependent derivatives (A, B0, B1, Q) are stored with shape
+        (n_dt, n_par, nx, ·), such that all the derivatives needed by a filter step are
+        a single contiguous block.
+        """
+        ss = self.ss
+        parameters = ss.parameters
+        eta = np.array(parameters.eta_free, dtype=float)
+        n_par = eta.size
+        dts, idx = self._unique_dt(dt)
+        h = np.finfo(float).eps ** (1.0 / 3.0) * np.maximum(1.0, np.abs(eta))
+
+        def _matrices():
+            ss.update()
+            Ai, B0i, B1i, Qi = map(np.stack, zip(*map(ss.discretization, dts)))
+            Qi = np.einsum("tji,tjk->tik", Qi, Qi)
+            return (
+                Ai,
+                B0i,
+                B1i,
+                ss.C.copy(),
+                ss.D.copy(),
+                Qi,
+                ss.R.T @ ss.R,
+                ss.x0.copy(),
+                ss.P0.T @ ss.P0,
+            )
+
+        dA = np.zeros((dts.size, n_par, ss.nx, ss.nx))
+        dB0 = np.zeros((dts.size, n_par, ss.nx, ss.nu))
+        dB1 = np.zeros((dts.size, n_par, ss.nx, ss.nu))
+        dC = np.zeros((n_par, ss.ny, ss.nx))
+        dD = np.zeros((n_par, ss.ny, ss.nu))
+        dQ = np.zeros((dts.size, n_par, ss.nx, ss.nx))
+        dR = np.zeros((n_par, ss.ny, ss.ny))
+        dx0 = np.zeros((n_par, ss.nx, 1))
+        dP0 = np.zeros((n_par, ss.nx, ss.nx))
+        try:
+            for j in range(n_par):
+                eta_j = eta.copy()
+                eta_j[j] = eta[j] + h[j]
+                parameters.eta_free = eta_j
+                upper = _matrices()
+                eta_j[j] = eta[j] - h[j]
+                parameters.eta_free = eta_j
+                lower = _matrices()
+                for d, up, low in zip(
+                    (dA, dB0, dB1, dC, dD, dQ, dR, dx0, dP0), upper, lower
+                ):
+                    if d.ndim == 4:
+                        d[:, j] = (up - low) / (2.0 * h[j])
+                    else:
+                        d[j] = (up - low) / (2.0 * h[j])
+        finally:
+            parameters.eta_free = eta
+            ss.update()
+
+        dstates = States(dA, dB0, dB1, dC, dD, dQ, dR, idx)
+        return dstates, dx0, dP0
+
     def update(
         self,
         x: np.ndarray,
@@ -431,9 +888,10 @@ class KalmanQR:
         """
         x, P = deepcopy(x), deepcopy(P)
         A, B0, B1, Q = self.ss.discretization(dt)
+        _Arrp = np.zeros((2 * self.ss.nx, self.ss.nx))
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", category=NumbaPerformanceWarning)
-            return _predict(A, B0, B1, Q, x, P, u, dtu)
+            return _predict(A, B0, B1, Q, x, P, u, dtu, _Arrp)
 
     def log_likelihood(
         self,
@@ -462,9 +920,146 @@ class KalmanQR:
         """
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", category=NumbaPerformanceWarning)
+            params = self._proxy_params(dt, (u, dtu, y))
+            if np.dtype(self.dtype) != np.float64:
+                log_likelihood = float(_log_likelihood(*self._to_dtype(params)))
+                # fall back to float64 if the reduced precision broke the filter
+                if np.isfinite(log_likelihood):
+                    return log_likelihood
+
+            return _log_likelihood(*params)
+
+    def log_likelihood_grad(
+        self,
+        dt: pd.Series,
+        u: pd.DataFrame,
+        dtu: pd.DataFrame,
+        y: pd.DataFrame,
+    ) -> tuple[float, np.ndarray]:
+        """Compute the log-likelihood of the model and its gradient with respect to
+        the free unconstrained parameters η.
+
+        The gradient is obtained in a single pass, by propagating the sensitivity
+        equations of the Kalman filter alongside the filter itself, instead of
+        running two filters per parameter as a finite differences scheme would do.
+
+        Parameters
+        ----------
+        dt : pd.Series
+            Time steps.
+        u : pd.DataFrame
+            Output (or exogeneous) vector.
+        dtu : pd.DataFrame
+            Time derivative of the output vector.
+        y : pd.DataFrame
+            Measurement (or observation) vector.
+
+        Returns
+        -------
+        float
+            Log-likelihood of the model.
+        np.ndarray
+            Gradient of the log-likelihood with respect to the free unconstrained
+            parameters η.
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=NumbaPerformanceWarning)
+            dstates, dx0, dP0 = self._proxy_params_grad(dt)
             x0, P0, u, dtu, y, states = self._proxy_params(dt, (u, dtu, y))
 
-            return _log_likelihood(x0, P0, u, dtu, y, states)
+            return _log_likelihood_grad(
+                x0, P0, u, dtu, y, states, dstates, dx0, dP0
+            )
+
+    def log_likelihood_grad_batch(
+        self,
+        dt: pd.Series,
+        u: Sequence[pd.DataFrame],
+        dtu: Sequence[pd.DataFrame],
+        y: Sequence[pd.DataFrame],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Compute the log-likelihood of the model and its gradient with respect to
+        the free unconstrained parameters η for a batch of independent series.
+
+        The model matrices and their derivatives are computed once and shared by all
+        the series, which share the same time steps.
+
+        Parameters
+        ----------
+        dt : pd.Series
+            Time steps, common to all the series.
+        u : sequence of pd.DataFrame
+            Output (or exogeneous) vector of each series.
+        dtu : sequence of pd.DataFrame
+            Time derivative of the output vector of each series.
+        y : sequence of pd.DataFrame
+            Measurement (or observation) vector of each series.
+
+        Returns
+        -------
+        np.ndarray
+            Log-likelihood of the model for each series.
+        np.ndarray
+            Gradient of the log-likelihood for each series, of shape
+            (n_series, n_eta).
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=NumbaPerformanceWarning)
+            dstates, dx0, dP0 = self._proxy_params_grad(dt)
+            x0, P0, states = self._proxy_params(dt, ())
+            log_likelihood, grad = zip(
+                *(
+                    _log_likelihood_grad(
+                        x0,
+                        P0,
+                        u_i.to_numpy(),
+                        dtu_i.to_numpy(),
+                        y_i.to_numpy(),
+                        states,
+                        dstates,
+                        dx0,
+                        dP0,
+                    )
+                    for u_i, dtu_i, y_i in zip(u, dtu, y)
+                )
+            )
+        return np.array(log_likelihood), np.vstack(grad)
+
+    def log_likelihood_batch(
+        self,
+        dt: pd.Series,
+        u: Sequence[pd.DataFrame],
+        dtu: Sequence[pd.DataFrame],
+        y: Sequence[pd.DataFrame],
+    ) -> np.ndarray:
+        """Compute the log-likelihood of the model for a batch of independent series.
+
+        All the series share the state-space model and the time steps: they are
+        filtered together, each time step being vectorized over the batch.
+
+        Parameters
+        ----------
+        dt : pd.Series
+            Time steps, common to all the series.
+        u : sequence of pd.DataFrame
+            Output (or exogeneous) vector of each series.
+        dtu : sequence of pd.DataFrame
+            Time derivative of the output vector of each series.
+        y : sequence of pd.DataFrame
+            Measurement (or observation) vector of each series.
+
+        Returns
+        -------
+        np.ndarray
+            Log-likelihood of the model for each series.
+        """
+        x0, P0, states = self._proxy_params(dt, ())
+        u, dtu, y = (
+            np.stack([var.to_numpy(dtype=float) for var in vars])
+            for vars in (u, dtu, y)
+        )
+        params = self._to_dtype((x0, P0, u, dtu, y, states))
+        return _log_likelihood_batch(*params).astype(np.float64)
 
     def filtering(
         self,
@@ -514,11 +1109,96 @@ class KalmanQR:
                 Innovation covariance matrix.
 
         """
+        if self.scan_threshold is not None and len(y) > self.scan_threshold:
+            return self.filtering_scan(dt, u, dtu, y, x0, P0)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=NumbaPerformanceWarning)
+            params = self._proxy_params(dt, (u, dtu, y), x0, P0)
+
+            return _filtering(*self._to_dtype(params))
+
+    def filtering_scan(
+        self,
+        dt: pd.Series,
+        u: pd.DataFrame,
+        dtu: pd.DataFrame,
+        y: pd.DataFrame,
+        x0: np.ndarray | None = None,
+        P0: np.ndarray | None = None,
+    ) -> KalmanResult:
+        """Filter the data using the parallel formulation of the Kalman filter.
+
+        The filter is written as an associative scan over the time steps, which is
+        evaluated by a tree reduction of depth O(log n_timesteps) vectorized over the
+        time steps, instead of a sequential recursion of depth O(n_timesteps). It gives
+        the same results as `filtering`. Unlike `filtering`, the covariance matrices
+        are propagated in their full form, in np.float64 whatever `dtype` is. With the
+        vectorized numpy implementation, it is on par with the sequential filter for
+        small state dimensions.
+
+        Parameters
+        ----------
+        dt : pd.Series
+            Time steps.
+        u : pd.DataFrame
+            Output (or exogeneous) vector.
+        dtu : pd.DataFrame
+            Time derivative of the output vector.
+        y : pd.DataFrame
+            Measurement (or observation) vector.
+        x0 : np.ndarray, optional
+            Initial state vector, by default None. If None, the initial state vector
+            provided by the statespace model is used.
+        P0 : np.ndarray, optional
+            Initial covariance matrix, by default None. If None, the initial covariance
+            matrix provided by the statespace model is used.
+
+        Returns
+        -------
+        KalmanResult
+            Same as `filtering`.
+        """
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", category=NumbaPerformanceWarning)
             x0, P0, u, dtu, y, states = self._proxy_params(dt, (u, dtu, y), x0, P0)
+            return _filtering_scan(
+                x0, P0, *(np.asarray(var, dtype=float) for var in (u, dtu, y)), states
+            )
+
+    def filtering_mean(
+        self,
+        dt: pd.Series,
+        u: pd.DataFrame,
+        dtu: pd.DataFrame,
+        x0: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Filtered state mean when no output is available.
 
-            return _filtering(x0, P0, u, dtu, y, states)
+        This is the mean of `filtering` with missing outputs, obtained without
+        propagating the covariance matrix.
+
+        Parameters
+        ----------
+        dt : pd.Series
+            Time steps.
+        u : pd.DataFrame
+            Output (or exogeneous) vector.
+        dtu : pd.DataFrame
+            Time derivative of the output vector.
+        x0 : np.ndarray, optional
+            Initial state vector, by default None. If None, the initial state vector
+            provided by the statespace model is used.
+
+        Returns
+        -------
+        np.ndarray[n_timesteps, nx, 1]
+            Filtered state vector.
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=NumbaPerformanceWarning)
+            x0, _, u, dtu, states = self._proxy_params(dt, (u, dtu), x0)
+            return _filtering_mean(x0, u, dtu, states)
 
     def smoothing(
         self,
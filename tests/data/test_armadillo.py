@@ -1,9 +1,13 @@
+from copy import deepcopy
+
 import numpy as np
 import pandas as pd
 import pytest
+from scipy.optimize import approx_fprime
 
 from pysip.params.prior import LogNormal, Normal
 from pysip.regressors import Regressor
+from pysip.statespace import discretization
 from pysip.statespace.thermal_network import TwTi_RoRi
 from pysip.utils.math import fit, mad, mae, ned, rmse, smape
 from pysip.utils.statistics import aic, ccf, check_ccf, check_cpgram, cpgram, lrtest
@@ -86,3 +90,212 @@ def test_fit_predict(data_armadillo, regressor_armadillo):
     assert res.mean() == pytest.approx(0, abs=5e-2)
     assert check_ccf(*ccf(res))[0]
     assert check_cpgram(*cpgram(res))[0]
+
+
+def test_log_likelihood_batch(data_armadillo, regressor_armadillo):
+    dfs = [data_armadillo, data_armadillo.copy()]
+    rng = np.random.default_rng(42)
+    dfs[1]["T_int"] += 0.1 * rng.standard_normal(len(data_armadillo))
+    dfs[1].iloc[::7, dfs[1].columns.get_loc("T_int")] = np.nan
+    data = regressor_armadillo.prepare_data_batch(dfs)
+
+    loglik = [regressor_armadillo.log_likelihood(df=df) for df in dfs]
+    loglik_batch = regressor_armadillo.estimator.log_likelihood_batch(*data)
+    loglik_grad, _ = regressor_armadillo.estimator.log_likelihood_grad_batch(*data)
+
+    assert loglik_batch == pytest.approx(loglik)
+    assert loglik_grad == pytest.approx(loglik)
+
+
+def test_fit_batch(data_armadillo, statespace_armadillo, monkeypatch):
+    def regressor():
+        return Regressor(
+            ss=deepcopy(statespace_armadillo),
+            outputs="T_int",
+            inputs=["T_ext", "P_hea"],
+        )
+
+    summary, _, results = regressor().fit(df=data_armadillo)
+    summary_batch, _, results_batch = regressor().fit_batch([data_armadillo])
+    assert results_batch.fun == pytest.approx(results.fun, rel=1e-6)
+    assert summary_batch["θ"].values == pytest.approx(summary["θ"].values, rel=1e-3)
+
+    dfs = [data_armadillo, data_armadillo.copy()]
+    rng = np.random.default_rng(42)
+    dfs[1]["T_int"] += 0.1 * rng.standard_normal(len(data_armadillo))
+
+    n_obs = []
+
+    def ttest(theta, sigma, N):
+        n_obs.append(N)
+        return np.full(len(theta), np.nan)
+
+    monkeypatch.setattr("pysip.regressors.ttest", ttest)
+    summary_jac, _, results_jac = regressor().fit_batch(dfs)
+    assert n_obs == [len(dfs) * len(data_armadillo)]
+
+    summary_fd, _, results_fd = regressor().fit_batch(dfs, jac="3-point")
+    assert results_fd.fun == pytest.approx(results_jac.fun, rel=1e-6)
+    assert summary_fd["θ"].values == pytest.approx(
+        summary_jac["θ"].values, rel=1e-2
+    )
+
+
+def test_prepare_data_batch_time_steps(data_armadillo, regressor_armadillo):
+    with pytest.raises(ValueError):
+        regressor_armadillo.prepare_data_batch(
+            [data_armadillo, data_armadillo.iloc[:-1]]
+        )
+
+
+def test_unique_dt(regressor_armadillo):
+    dt = np.array([1.0 / 86400.0, 3e-10, 1.0 / 86400.0 * (1.0 + 1e-12), 3e-10, 0.1])
+    dts, idx = regressor_armadillo.estimator._unique_dt(dt)
+
+    assert dts[idx] == pytest.approx(dt, rel=1e-9)
+    assert set(dts) <= set(dt)
+    assert dts.size == 3
+    assert idx[0] == idx[2]
+
+
+def test_fit_lbfgsb(data_armadillo, statespace_armadillo):
+    summaries = {}
+    for method in ["BFGS", "L-BFGS-B"]:
+        reg = Regressor(
+            ss=deepcopy(statespace_armadillo),
+            outputs="T_int",
+            inputs=["T_ext", "P_hea"],
+        )
+        summaries[method], _, results = reg.fit(
+            df=data_armadillo, method=method, compute_pvalues=method == "BFGS"
+        )
+        assert results.fun == pytest.approx(-316.68812014562525, rel=1e-2)
+        assert isinstance(results.hess_inv, np.ndarray)
+
+    assert summaries["L-BFGS-B"]["θ"].values == pytest.approx(
+        summaries["BFGS"]["θ"].values, rel=1e-3
+    )
+    assert summaries["L-BFGS-B"]["σ(θ)"].values == pytest.approx(
+        summaries["BFGS"]["σ(θ)"].values, rel=1e-1
+    )
+    assert summaries["BFGS"]["pvalue"].notna().all()
+    assert summaries["L-BFGS-B"]["pvalue"].isna().all()
+
+
+def test_predict_output_moments(data_armadillo, regressor_armadillo):
+    ds = regressor_armadillo.predict(df=data_armadillo)
+    C = regressor_armadillo.ss.C
+    R = regressor_armadillo.ss.R
+    y_mean = (C @ ds.x.values[..., np.newaxis])[..., 0]
+    y_std = np.sqrt((C @ ds.P.values @ C.T)[..., 0]) + R[0]
+
+    assert ds.y_mean.values == pytest.approx(y_mean)
+    assert ds.y_std.values == pytest.approx(y_std)
+
+
+def test_predict_mean_only(data_armadillo, regressor_armadillo):
+    tnew = np.linspace(data_armadillo.index[0], data_armadillo.index[-1], 500)
+    ds = regressor_armadillo.predict(df=data_armadillo, tnew=tnew, use_outputs=False)
+    ds_mean = regressor_armadillo.predict(
+        df=data_armadillo, tnew=tnew, use_outputs=False, return_std=False
+    )
+
+    assert "y_std" not in ds_mean
+    assert ds_mean.y_mean.values == pytest.approx(ds.y_mean.values)
+
+
+def test_filtering_scan(data_armadillo, regressor_armadillo):
+    df = data_armadillo.copy()
+    df.iloc[50:70, df.columns.get_loc("T_int")] = np.nan
+    estimator = regressor_armadillo.estimator
+    data = regressor_armadillo.prepare_data(df)
+    res = estimator.filtering(*data)
+    res_scan = estimator.filtering_scan(*data)
+
+    for value, value_scan in zip(res, res_scan):
+        np.testing.assert_allclose(value_scan, value, rtol=1e-8, atol=1e-10)
+
+    estimator.scan_threshold = 100
+    ds = regressor_armadillo.estimate_states(df)
+    np.testing.assert_allclose(ds.x.values, res_scan.x[..., 0])
+
+
+def test_log_likelihood_float32(data_armadillo, statespace_armadillo):
+    reg = Regressor(
+        ss=statespace_armadillo,
+        outputs="T_int",
+        inputs=["T_ext", "P_hea"],
+        dtype=np.float32,
+    )
+    data = reg.prepare_data(data_armadillo)
+    loglik = reg.estimator.log_likelihood(*data)
+    res = reg.estimator.filtering(*data)
+    assert reg.estimator.check_dtype(*data)
+    assert reg.estimator.dtype == np.float32
+
+    reg.estimator.dtype = np.float64
+    assert loglik == pytest.approx(reg.estimator.log_likelihood(*data), rel=1e-5)
+    assert res.x == pytest.approx(reg.estimator.filtering(*data).x, rel=1e-4)
+
+    reg.estimator.dtype = np.float32
+    with pytest.warns(UserWarning):
+        assert not reg._check_dtype(*data, rtol=0.0)
+    assert reg.estimator.dtype == np.float64
+    assert reg.dtype == np.float64
+
+
+def test_fit_warm_start(data_armadillo, statespace_armadillo):
+    reg = Regressor(
+        ss=deepcopy(statespace_armadillo), outputs="T_int", inputs=["T_ext", "P_hea"]
+    )
+    eta0 = reg.parameters.eta_free
+    _, _, results_cold = reg.fit(df=data_armadillo)
+
+    reg.parameters.eta_free = eta0
+    _, _, results_warm = reg.fit(df=data_armadillo, warm_start=True)
+
+    assert results_warm.fun == pytest.approx(results_cold.fun, rel=1e-4)
+    assert results_warm.nfev < results_cold.nfev
+
+    def jac(eta, *data):
+        return reg._target_and_grad(eta, *data)[1]
+
+    reg.parameters.eta_free = eta0
+    _, _, results_jac = reg.fit(df=data_armadillo, jac=jac, warm_start=True)
+
+    assert results_jac.fun == pytest.approx(results_cold.fun, rel=1e-4)
+    assert results_jac.x == pytest.approx(results_cold.x, rel=1e-2)
+
+
+def test_fit_gradient_free(data_armadillo, regressor_armadillo):
+    summary, _, results = regressor_armadillo.fit(
+        df=data_armadillo, method="Nelder-Mead", maxiter=20
+    )
+
+    assert np.isfinite(summary["|g(η)|"].values).all()
+    assert isinstance(results.hess_inv, np.ndarray)
+
+    with pytest.warns(UserWarning):
+        hess_inv = regressor_armadillo._inv_hessian(np.diag([1.0, -1.0]))
+    assert np.isnan(hess_inv).all()
+
+
+def test_discretization_2x2(data_armadillo, regressor_armadillo):
+    ss = regressor_armadillo.ss
+    ss.update()
+    for dt in (1e-3, 1e-2, 1.0 / 24.0):
+        Ad, B0d, B1d, Qd = ss.discretization(dt)
+        Ad_mfd, B0d_mfd, B1d_mfd = discretization.state_input_expm(ss.A, ss.B, dt, 1)
+        Qd_mfd = discretization.diffusion_mfd(ss.A, ss.Q.T @ ss.Q, dt)
+
+        np.testing.assert_allclose(Ad, Ad_mfd, rtol=1e-12, atol=1e-15)
+        np.testing.assert_allclose(B0d, B0d_mfd, rtol=1e-12, atol=1e-15)
+        np.testing.assert_allclose(B1d, B1d_mfd, rtol=1e-12, atol=1e-15)
+        np.testing.assert_allclose(Qd.T @ Qd, Qd_mfd, rtol=1e-10, atol=1e-15)
+
+    data = regressor_armadillo.prepare_data(data_armadillo)
+    eta = regressor_armadillo.parameters.eta_free
+    _, grad = regressor_armadillo._target_and_grad(eta, *data)
+    assert grad == pytest.approx(
+        approx_fprime(eta, regressor_armadillo._target, 1e-6, *data), rel=1e-4
+    )
@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 import pytest
+from scipy.optimize import approx_fprime
 
 from pysip.params.prior import InverseGamma as iGa
 from pysip.regressors import Regressor
@@ -48,6 +49,16 @@ def test_log_posterior(data_raw, regressor: Regressor):
     assert lp_ == pytest.approx(180.204, rel=1e-3)
 
 
+def test_log_posterior_grad(data_raw: pd.DataFrame, regressor: Regressor):
+    data = regressor.prepare_data(data_raw)
+    eta = regressor.parameters.eta_free
+    lp_, grad = regressor._target_and_grad(eta, *data)
+    assert lp_ == pytest.approx(regressor._target(eta, *data))
+    assert grad == pytest.approx(
+        approx_fprime(eta, regressor._target, 1e-6, *data), rel=1e-4
+    )
+
+
 def test_kalman_filter(data_raw: pd.DataFrame, regressor: Regressor):
     ds_residuals = regressor.eval_residuals(df=data_raw)
     ds_filtered = regressor.estimate_states(df=data_raw)
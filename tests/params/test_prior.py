@@ -2,7 +2,7 @@ import numpy as np
 import pytest
 from scipy import stats
 
-from pysip.params.prior import Beta, Gamma, InverseGamma, LogNormal, Normal
+from pysip.params.prior import Beta, Gamma, InverseGamma, LogNormal, Normal, Uniform
 
 
 @pytest.fixture(name="N")
@@ -33,3 +33,22 @@ def test_log_pdf(Prior, log, scipy_fun, N):
     assert prior.logpdf(0.3) == pytest.approx(log)
     assert prior.mean == pytest.approx(np.mean(rvs), abs=3 * np.std(rvs) / np.sqrt(N))
     assert prior.logpdf(x) == pytest.approx(scipy_fun.logpdf(x))
+
+
+@pytest.mark.parametrize(
+    "prior, dlogpdf",
+    [
+        (Normal(1.0, 2.0), lambda x: -(x - 1.0) / 2.0**2),
+        (Gamma(3.0, 2.0), lambda x: (3.0 - 1.0) / x - 2.0),
+        (Beta(3.0, 2.0), lambda x: (3.0 - 1.0) / x - (2.0 - 1.0) / (1.0 - x)),
+        (InverseGamma(3.0, 2.0), lambda x: -(3.0 + 1.0) / x + 2.0 / x**2),
+        (LogNormal(1.0, 2.0), lambda x: -(1.0 + (np.log(x) - 1.0) / 2.0**2) / x),
+        (Uniform(0.0, 2.0), lambda x: 0.0),
+    ],
+)
+def test_dlogpdf(prior, dlogpdf):
+    for x in (0.3, 0.7):
+        assert prior.dlogpdf(x) == pytest.approx(dlogpdf(x))
+    # finite close to the edges of the support
+    for x in (5e-9, 1.0 - 1e-9):
+        assert np.isfinite(prior.dlogpdf(x))
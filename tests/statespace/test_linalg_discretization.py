@@ -1,6 +1,6 @@
 import numpy as np
 import pytest
-from scipy.linalg import eig, eigvals, expm, inv
+from scipy.linalg import eig, eigvals, expm, inv, solve_continuous_lyapunov
 
 from pysip.statespace.discretization import (
     eig_2x2,
@@ -8,7 +8,11 @@ from pysip.statespace.discretization import (
     eigvals_3x3,
     expm_2x2,
     inv_2x2,
+    diffusion_2x2,
+    diffusion_mfd,
     inv_3x3,
+    lyap_2x2,
+    phi_2x2,
 )
 
 
@@ -64,3 +68,60 @@ def test_eig_2x2(random_2x2):
 
 def test_expm_2x2(random_2x2):
     assert np.allclose(expm(random_2x2), expm_2x2(random_2x2))
+
+
+@pytest.mark.parametrize(
+    "X",
+    [
+        np.array([[-1.0, 2.0], [-3.0, -0.5]]),
+        np.array([[-2.0, 1.0], [0.0, -2.0]]),
+        np.array([[-300.0, 10.0], [100.0, -5.0]]),
+    ],
+)
+def test_expm_2x2_closed_form(X):
+    assert np.allclose(expm(X), expm_2x2(X), rtol=1e-10, atol=1e-12)
+
+
+def test_lyap_2x2(random_2x2):
+    A = -random_2x2
+    Q = np.array([[2.0, 0.3], [0.3, 1.0]])
+    assert np.allclose(solve_continuous_lyapunov(A, Q), lyap_2x2(A, Q))
+
+
+def test_lyap_2x2_singular():
+    A = np.array([[1.0, 0.3], [0.2, -1.0]])
+    with pytest.warns(RuntimeWarning):
+        X = lyap_2x2(A, np.eye(2))
+    assert np.isfinite(X).all()
+
+
+@pytest.mark.parametrize(
+    "X",
+    [
+        np.array([[-1.0, 2.0], [-3.0, -0.5]]),
+        np.array([[-2.0, 1.0], [0.0, -2.0]]),
+        np.array([[-300.0, 10.0], [100.0, -5.0]]),
+        np.array([[-1e-3, 1e-3], [1e-2, -1.2e-2]]),
+        np.zeros((2, 2)),
+    ],
+)
+def test_phi_2x2(X):
+    F = np.zeros((6, 6))
+    F[:2, :2] = X
+    F[:2, 2:4] = np.eye(2)
+    F[2:4, 4:] = np.eye(2)
+    Fd = expm(F)
+    E, phi1, phi2 = phi_2x2(X)
+
+    assert np.allclose(E, Fd[:2, :2], rtol=1e-12, atol=1e-14)
+    assert np.allclose(phi1, Fd[:2, 2:4], rtol=1e-12, atol=1e-14)
+    assert np.allclose(phi2, Fd[:2, 4:], rtol=1e-12, atol=1e-14)
+
+
+@pytest.mark.parametrize("dt", [1e-4, 1.0 / 24.0, 0.5])
+def test_diffusion_2x2(random_2x2, dt):
+    A = -random_2x2
+    Q = np.array([[2.0, 0.3], [0.3, 1.0]])
+    assert np.allclose(
+        diffusion_mfd(A, Q, dt), diffusion_2x2(A, Q, dt), rtol=1e-10, atol=1e-14
+    )